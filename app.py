@@ -1,31 +1,162 @@
+import argparse
 import logging
 import os
 
-import cpp_parser
+import cache
+import discovery
+import matcher
 
 logging.basicConfig(level=logging.WARNING)
 
 
-def parse_files(root_directory):
+def parse_files(root_directory, finder=None):
+    # Imported lazily so that commands working on cached blocks do not have to
+    # load libclang.
+    import cpp_parser
+
+    if finder is None:
+        finder = discovery.FileFinder()
+
     parser = cpp_parser.Parser()
 
-    for directory, _, filenames in os.walk(root_directory):
-        for filename in filenames:
-            parts = os.path.splitext(filename)
-            if len(parts) > 1 and parts[1] in ('.cc', '.cpp', '.h', 'hpp', '.cxx', '.hxx'):
-                parser.parse(os.path.join(directory, filename))
+    for filename in finder.find(root_directory):
+        parser.parse(filename)
 
     return parser
 
 
-known_samples = parse_files('known_samples')
-to_check = parse_files('to_check')
+def load_corpus(path, finder=None):
+    if os.path.isdir(path):
+        return parse_files(path, finder).corpus
+
+    data = cache.load(path)
+    if isinstance(data, matcher.BlockIndex):
+        return data.corpus
+    return data
+
+
+def load_index(path, finder=None):
+    if not os.path.isdir(path):
+        data = cache.load(path)
+        if isinstance(data, matcher.BlockIndex):
+            return data
+        return matcher.BlockIndex(data)
+
+    return matcher.BlockIndex(load_corpus(path, finder))
+
+
+def make_finder(args):
+    return discovery.FileFinder(include=args.include or discovery.DEFAULT_INCLUDE,
+                                exclude=args.exclude or discovery.DEFAULT_EXCLUDE,
+                                gitignore=args.gitignore,
+                                git=args.git)
+
+
+def print_match(match, checked_corpus, compared_corpus):
+    checked_location = checked_corpus.locations.unpack(match.checked_block.location)
+    compared_location = compared_corpus.locations.unpack(match.compared_block.location)
+    print('comparing {} at {}'.format(match.checked_name, checked_location))
+    print('to        {} at {}'.format(match.compared_name, compared_location))
+    print('similarity: {}'.format(match.similarity))
+    print()
+
+
+def print_clone_classes(classes, corpus):
+    for index, members in enumerate(classes, 1):
+        print('clone class {}:'.format(index))
+        for name, location in members:
+            print('  {} at {}'.format(name, corpus.locations.unpack(location)))
+        print()
+
+
+def parse_command(args):
+    cache.save(load_corpus(args.source, make_finder(args)), args.output)
+
+
+def index_command(args):
+    cache.save(load_index(args.source, make_finder(args)), args.output)
+
+
+def check_command(args):
+    finder = make_finder(args)
+    known_samples = load_index(args.known, finder)
+    to_check = load_corpus(args.checked, finder)
+
+    for match in known_samples.check(to_check.blocks, args.blocking):
+        print_match(match, to_check, known_samples.corpus)
+
+
+def self_check_command(args):
+    codebase = load_index(args.source, make_finder(args))
+    matches = list(codebase.self_check(args.threshold, args.blocking))
+
+    for match in matches:
+        print_match(match, codebase.corpus, codebase.corpus)
+
+    print_clone_classes(matcher.clone_classes(matches), codebase.corpus)
+
+
+def make_argument_parser():
+    parser = argparse.ArgumentParser(prog='fcd', description='Find similar code fragments in C++ sources.')
+    parser.add_argument('-v', '--verbose', action='store_true', help='enable debug logging')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    # Only used when a source directory is given, cache and index files are
+    # loaded as they are.
+    discovery_parser = argparse.ArgumentParser(add_help=False)
+    discovery_parser.add_argument('--include', action='append', default=[], metavar='GLOB',
+                                  help='source files to parse, may be repeated (default: C++ sources and headers)')
+    discovery_parser.add_argument('--exclude', action='append', default=[], metavar='GLOB',
+                                  help='files or directories to skip, may be repeated (default: build, third_party '
+                                       'and vendor directories; VCS directories are always skipped)')
+    discovery_parser.add_argument('--no-gitignore', dest='gitignore', action='store_false',
+                                  help='do not skip files ignored by .gitignore')
+    discovery_parser.add_argument('--git', action='store_true',
+                                  help='list sources with git ls-files instead of walking the directory')
+
+    parse_parser = subparsers.add_parser('parse', parents=[discovery_parser],
+                                         help='parse sources and cache the resulting blocks')
+    parse_parser.add_argument('source', help='source directory')
+    parse_parser.add_argument('-o', '--output', required=True, help='cache file to write')
+    parse_parser.set_defaults(handler=parse_command)
+
+    index_parser = subparsers.add_parser('index', parents=[discovery_parser],
+                                         help='build a block index from sources or cached blocks')
+    index_parser.add_argument('source', help='source directory or cache file')
+    index_parser.add_argument('-o', '--output', required=True, help='index file to write')
+    index_parser.set_defaults(handler=index_command)
+
+    check_parser = subparsers.add_parser('check', parents=[discovery_parser],
+                                         help='compare blocks against known samples')
+    check_parser.add_argument('known', nargs='?', default='known_samples',
+                              help='directory, cache file or index of known samples')
+    check_parser.add_argument('checked', nargs='?', default='to_check',
+                              help='directory or cache file with the code to check')
+    check_parser.add_argument('--blocking', action='store_true',
+                              help='skip pairs whose size or node kinds are too different')
+    check_parser.set_defaults(handler=check_command)
+
+    self_check_parser = subparsers.add_parser('self-check', parents=[discovery_parser],
+                                              help='find clones inside a single codebase')
+    self_check_parser.add_argument('source', help='source directory, cache file or index')
+    self_check_parser.add_argument('-t', '--threshold', type=float, default=0.5,
+                                   help='minimal similarity of reported pairs (default: %(default)s)')
+    self_check_parser.add_argument('--no-blocking', dest='blocking', action='store_false',
+                                   help='compare all pairs, even those whose size or node kinds are too different')
+    self_check_parser.set_defaults(handler=self_check_command)
+
+    return parser
+
+
+def main(argv=None):
+    args = make_argument_parser().parse_args(argv)
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    args.handler(args)
+
 
-for checked_name, checked_ast in to_check.blocks.items():
-    for compared_name, compared_ast in known_samples.blocks.items():
-        similarity = compared_ast.compare(checked_ast)
-        if similarity > 0:
-            print('comparing {} at {}'.format(checked_name, checked_ast.location))
-            print('to        {} at {}'.format(compared_name, compared_ast.location))
-            print('similarity: {}'.format(similarity))
-            print()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+import pickle
+
+
+def save(obj, path):
+    with open(path, 'wb') as file:
+        pickle.dump(obj, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(path):
+    with open(path, 'rb') as file:
+        return pickle.load(file)
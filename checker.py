@@ -0,0 +1,196 @@
+import asyncio
+import functools
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from tree import Corpus, Location, LocationTable
+
+# Block index of known samples, set once per worker by init_worker so that it
+# does not have to be sent along with every source.
+worker_index = None
+
+
+def init_worker(index):
+    global worker_index
+    worker_index = index
+
+
+def check_sources(sources, blocking):
+    # Runs inside an executor, possibly in another process, so libclang is only
+    # loaded where parsing actually happens.
+    import cpp_parser
+
+    if worker_index is None:
+        raise RuntimeError('executor was not initialized with checker.init_worker')
+
+    parser = cpp_parser.Parser()
+
+    # A source that fails to parse must not fail the rest of its chunk, so
+    # every source gets either its matches or its error.
+    results = []
+    for filename, content in sources:
+        parser.corpus = Corpus()
+        try:
+            parser.parse_source(filename, content)
+            matches = [CheckMatch(match.checked_name, match.checked_block.location,
+                                  match.compared_name, match.compared_block.location,
+                                  match.similarity)
+                       for match in worker_index.check(parser.blocks, blocking)]
+        except Exception as error:
+            results.append((None, error))
+        else:
+            results.append((matches, None))
+    return results
+
+
+def content_digest(content):
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha1(content).hexdigest()
+
+
+class CheckMatch:
+    def __init__(self, checked_name, checked_location, compared_name, compared_location, similarity):
+        self.checked_name = checked_name
+        self.checked_location = checked_location
+        self.compared_name = compared_name
+        self.compared_location = compared_location
+        self.similarity = similarity
+
+    def __repr__(self):
+        return 'CheckMatch({}, {}, {})'.format(repr(self.checked_name), repr(self.compared_name),
+                                               repr(self.similarity))
+
+
+class CheckResult:
+    def __init__(self, filename, matches, error, known_corpus):
+        self.filename = filename
+        self.matches = matches
+        self.error = error
+        self.known_corpus = known_corpus
+
+    def checked_location(self, match):
+        # Identical sources are parsed only once, under a name derived from
+        # their content, so the file name is replaced with the requested one.
+        _, start, end = LocationTable.split(match.checked_location)
+        return Location(self.filename, start, end)
+
+    def compared_location(self, match):
+        return self.known_corpus.locations.unpack(match.compared_location)
+
+
+class Checker:
+    # A custom executor has to be created with initializer=init_worker and
+    # initargs=(index,), otherwise a process pool is started for the index.
+    def __init__(self, index, executor=None, workers=None, batch_window=0.01, max_chunk_size=16, blocking=False):
+        self.index = index
+        self.workers = workers or os.cpu_count() or 1
+        self.owns_executor = executor is None
+        if executor is None:
+            executor = ProcessPoolExecutor(self.workers, initializer=init_worker, initargs=(index,))
+        self.executor = executor
+        self.batch_window = batch_window
+        self.max_chunk_size = max_chunk_size
+        self.blocking = blocking
+        self.queue = []
+        self.in_flight = {}
+        self.batch_task = None
+        self.chunk_tasks = set()
+
+    def close(self):
+        if self.owns_executor:
+            self.executor.shutdown()
+
+    async def check(self, sources):
+        results = {}
+        async for result in self.stream(sources):
+            results[result.filename] = result
+        return results
+
+    async def stream(self, sources):
+        waiters = [self.wait(filename, self.submit(content)) for filename, content in sources.items()]
+        for waiter in asyncio.as_completed(waiters):
+            yield await waiter
+
+    async def wait(self, filename, future):
+        # The future may be shared with other requests for the same content, so
+        # it is shielded from the cancellation of this one.
+        matches, error = await asyncio.shield(future)
+        return CheckResult(filename, matches, error, self.index.corpus)
+
+    def submit(self, content):
+        digest = content_digest(content)
+
+        future = self.in_flight.get(digest)
+        if future is not None:
+            return future
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[digest] = future
+        self.queue.append((digest, content))
+
+        if self.batch_task is None:
+            self.batch_task = asyncio.ensure_future(self.run_batch())
+            self.batch_task.add_done_callback(self.batch_done)
+
+        return future
+
+    async def run_batch(self):
+        await asyncio.sleep(self.batch_window)
+
+        batch, self.queue = self.queue, []
+        self.batch_task = None
+
+        # The batch is spread over all workers and is not awaited, so requests
+        # arriving meanwhile start the next batch right away.
+        chunk_size = min(self.max_chunk_size, -(-len(batch) // self.workers))
+        for start in range(0, len(batch), chunk_size):
+            chunk = batch[start:start + chunk_size]
+            futures = [self.in_flight[digest] for digest, _ in chunk]
+            task = asyncio.ensure_future(self.run_chunk(chunk))
+            self.chunk_tasks.add(task)
+            task.add_done_callback(functools.partial(self.chunk_done, chunk, futures))
+
+    async def run_chunk(self, chunk):
+        loop = asyncio.get_running_loop()
+        sources = [(digest + '.cc', content) for digest, content in chunk]
+
+        results = None
+        try:
+            results = await loop.run_in_executor(self.executor, check_sources, sources, self.blocking)
+        except Exception as error:
+            results = [(None, error)] * len(chunk)
+        finally:
+            # If the chunk is cancelled, e.g. at loop shutdown, its callers are
+            # cancelled too rather than left waiting forever.
+            for index, (digest, _) in enumerate(chunk):
+                future = self.in_flight.pop(digest)
+                if results is None:
+                    future.cancel()
+                else:
+                    future.set_result(results[index])
+
+    def chunk_done(self, chunk, futures, task):
+        self.chunk_tasks.discard(task)
+
+        # A task cancelled before it started never runs the cleanup in
+        # run_chunk, so whatever is still pending is cancelled here.
+        for (digest, _), future in zip(chunk, futures):
+            if self.in_flight.get(digest) is future:
+                del self.in_flight[digest]
+            if not future.done():
+                future.cancel()
+
+    def batch_done(self, task):
+        # A batch cancelled while waiting for its window, possibly before it
+        # even started, still owns the queue, so the queued requests are
+        # cancelled with it.
+        if not task.cancelled():
+            return
+
+        batch, self.queue = self.queue, []
+        self.batch_task = None
+
+        for digest, _ in batch:
+            self.in_flight.pop(digest).cancel()
@@ -1,9 +1,10 @@
 import os
 import sys
-from clang.cindex import Config
 
 
 def init_clang():
+    from clang.cindex import Config
+
     if not Config.loaded:
         Config.set_library_file(get_libclang_path())
 
@@ -4,20 +4,30 @@ import clang.cindex
 from clang.cindex import Index, CursorKind, Cursor
 
 import config
-from tree import Location, Coordinate, ASTBuilder
+from tree import ASTBuilder, Corpus
 
 
 class Parser:
     def __init__(self):
         config.init_clang()
         self.index = Index.create()
-        self.blocks = {}
+        self.corpus = Corpus()
+
+    @property
+    def blocks(self):
+        return self.corpus.blocks
 
     def parse(self, filename, flags=None):
+        self.parse_translation_unit(filename, flags)
+
+    def parse_source(self, filename, content, flags=None):
+        self.parse_translation_unit(filename, flags, unsaved_files=[(filename, content)])
+
+    def parse_translation_unit(self, filename, flags, unsaved_files=None):
         if flags is None:
             flags = config.get_ccflags()
 
-        tu = self.index.parse(filename, flags)
+        tu = self.index.parse(filename, flags, unsaved_files=unsaved_files)
 
         for node in tu.cursor.get_children():
             if node.location.file.name != filename:
@@ -34,17 +44,18 @@ class Parser:
                 self.process_function(node)
 
     def process_function(self, fn_node):
-        fn_parser = FunctionParser(fn_node)
+        fn_parser = FunctionParser(fn_node, self.corpus)
         fn_parser.parse()
         if fn_parser.has_statements():
-            self.blocks[fn_parser.name] = fn_parser.statements
+            self.corpus.add_block(fn_parser.name, fn_parser.statements)
 
 
 class FunctionParser:
-    def __init__(self, fn_node):
+    def __init__(self, fn_node, corpus):
         self.fn_node = fn_node
-        self.builder = ASTBuilder()
-        self.builder.open_root(ClangLocation(fn_node))
+        self.locations = corpus.locations
+        self.builder = ASTBuilder(corpus.strings)
+        self.builder.open_root(self.location(fn_node))
 
     @property
     def name(self):
@@ -119,53 +130,56 @@ class FunctionParser:
         else:
             self.process_unknown(node)
 
+    def location(self, node):
+        return pack_location(self.locations, node.location.file.name, node.extent.start, node.extent.end)
+
     def process_children(self, node):
         for child in node.get_children():
             self.process_node(child)
 
     def process_null(self, node):
-        self.builder.add_null(node.location)
+        self.builder.add_null(pack_location(self.locations, node.filename, node.start, node.end))
 
     def process_decl(self, node):
         self.process_children(node)
 
     def process_var_decl(self, node):
-        self.builder.open_assignment(ClangLocation(node))
-        self.builder.add_identifier(node.spelling, ClangLocation(node))
+        self.builder.open_assignment(self.location(node))
+        self.builder.add_identifier(node.spelling, self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
     def process_unknown(self, node):
         logging.warning('[FunctionParser] unknown %s', node.kind)
-        self.builder.add_unknown(ClangLocation(node))
+        self.builder.add_unknown(self.location(node))
 
     def process_integer_literal(self, node):
         token = next(node.get_tokens())
-        self.builder.add_literal(token.spelling, ClangLocation(node))
+        self.builder.add_literal(token.spelling, self.location(node))
 
     def process_unexposed_expr(self, node):
         self.process_children(node)
 
     def process_return_stmt(self, node):
-        self.builder.open_return(ClangLocation(node))
+        self.builder.open_return(self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
     def process_decl_ref_expr(self, node):
-        self.builder.add_identifier(node.spelling, ClangLocation(node))
+        self.builder.add_identifier(node.spelling, self.location(node))
 
     def process_for_stmt(self, node):
-        self.builder.open_cstyle_loop(ClangLocation(node))
+        self.builder.open_cstyle_loop(self.location(node))
         self.process_children(NullAwareCursorAdapter.from_cursor(node))
         self.builder.close_node()
 
     def process_binary_operator(self, node):
-        self.builder.open_binary_operation(self.get_operation(node), ClangLocation(node))
+        self.builder.open_binary_operation(self.get_operation(node), self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
     def process_unary_operator(self, node):
-        self.builder.open_unary_operation(self.get_operation(node), ClangLocation(node))
+        self.builder.open_unary_operation(self.get_operation(node), self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
@@ -181,39 +195,39 @@ class FunctionParser:
         return ''
 
     def process_compound_stmt(self, node):
-        self.builder.open_block(ClangLocation(node))
+        self.builder.open_block(self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
     def process_compound_assignment_operator(self, node):
         operation = self.get_operation(node)[:-1]
-        self.builder.open_compound_assignment(operation, ClangLocation(node))
+        self.builder.open_compound_assignment(operation, self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
     def process_if_stmt(self, node):
-        self.builder.open_if_statement(ClangLocation(node))
+        self.builder.open_if_statement(self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
     def process_break_stmt(self, node):
-        self.builder.add_break(ClangLocation(node))
+        self.builder.add_break(self.location(node))
 
     def process_continue_stmt(self, node):
-        self.builder.add_continue(ClangLocation(node))
+        self.builder.add_continue(self.location(node))
 
     def process_while_stmt(self, node):
-        self.builder.open_while_statement(ClangLocation(node))
+        self.builder.open_while_statement(self.location(node))
         self.process_children(node)
         self.builder.close_node()
 
     def process_string_literal(self, node):
         token = next(node.get_tokens())
-        self.builder.add_literal(token.spelling, ClangLocation(node))
+        self.builder.add_literal(token.spelling, self.location(node))
 
     def process_floating_literal(self, node):
         token = next(node.get_tokens())
-        self.builder.add_literal(token.spelling, ClangLocation(node))
+        self.builder.add_literal(token.spelling, self.location(node))
 
 
 class NullCursorSentinel:
@@ -222,19 +236,19 @@ class NullCursorSentinel:
         self.left = None
         self.right = None
 
+    @property
+    def filename(self):
+        return self.parent.location.file.name
+
     @property
     def start(self):
         node = self.left or self.parent
-        return ClangLocation(node).start
+        return node.extent.start
 
     @property
     def end(self):
         node = self.right or self.parent
-        return ClangLocation(node).end
-
-    @property
-    def location(self):
-        return Location(self.parent.location.file.name, self.start, self.end)
+        return node.extent.end
 
 
 class NullAwareCursorAdapter(Cursor):
@@ -275,14 +289,7 @@ class NullAwareCursorAdapter(Cursor):
         return cursor
 
 
-class ClangLocation(Location):
-    def __init__(self, node):
-        filename = node.location.file.name
-        start = ClangCoordinate(node.extent.start)
-        end = ClangCoordinate(node.extent.end)
-        super().__init__(filename, start, end)
-
-
-class ClangCoordinate(Coordinate):
-    def __init__(self, source_location):
-        super().__init__(source_location.line, source_location.column)
+# Locations are interned into the corpus location table as packed integers,
+# so that pickled blocks stay small and do not reference libclang objects.
+def pack_location(locations, filename, start, end):
+    return locations.pack(filename, start.line, start.column, end.line, end.column)
@@ -0,0 +1,256 @@
+import fnmatch
+import os
+import re
+import subprocess
+
+DEFAULT_INCLUDE = ('*.cc', '*.cpp', '*.cxx', '*.h', '*.hpp', '*.hxx')
+
+# Version control directories are always pruned, whatever the exclude rules.
+VCS_DIRECTORIES = ('.git', '.hg', '.svn')
+
+DEFAULT_EXCLUDE = ('build', 'cmake-build-*', 'third_party', 'vendor')
+
+
+def translate_gitignore_pattern(pattern):
+    parts = []
+    index = 0
+
+    while index < len(pattern):
+        if pattern.startswith('**/', index):
+            parts.append('(?:.*/)?')
+            index += 3
+        elif pattern.startswith('/**', index) and index + 3 == len(pattern):
+            parts.append('/.*')
+            index += 3
+        elif pattern[index] == '*':
+            parts.append('[^/]*')
+            index += 1
+        elif pattern[index] == '?':
+            parts.append('[^/]')
+            index += 1
+        elif pattern[index] == '\\' and index + 1 < len(pattern):
+            parts.append(re.escape(pattern[index + 1]))
+            index += 2
+        elif pattern[index] == '[':
+            end = pattern.find(']', index + 2)
+            if end == -1:
+                parts.append(re.escape('['))
+                index += 1
+            else:
+                parts.append(translate_bracket_expression(pattern[index + 1:end]))
+                index = end + 1
+        else:
+            parts.append(re.escape(pattern[index]))
+            index += 1
+
+    return re.compile(''.join(parts) + r'\Z')
+
+
+def translate_bracket_expression(expression):
+    negated = expression[:1] in ('!', '^')
+    if negated:
+        expression = expression[1:]
+
+    characters = ''.join('\\' + character if character in '\\^[]' else character for character in expression)
+    # Like wildcards, a negated class never matches a path separator.
+    return '[' + ('^/' if negated else '') + characters + ']'
+
+
+def strip_trailing_spaces(line):
+    stripped = line.rstrip(' ')
+    if stripped.endswith('\\') and len(stripped) < len(line):
+        return stripped + ' '
+    return stripped
+
+
+class GitIgnoreRule:
+    def __init__(self, pattern, base):
+        self.negated = pattern.startswith('!')
+        if self.negated:
+            pattern = pattern[1:]
+
+        self.directory_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+
+        # Patterns without a slash match at any depth below the .gitignore,
+        # all other ones are relative to its directory.
+        self.anchored = '/' in pattern
+        self.base = base
+        self.regex = translate_gitignore_pattern(pattern.lstrip('/'))
+
+    def matches(self, path, is_directory):
+        if self.directory_only and not is_directory:
+            return False
+
+        if self.base:
+            if not path.startswith(self.base + '/'):
+                return False
+            path = path[len(self.base) + 1:]
+
+        if self.anchored:
+            return self.regex.match(path) is not None
+        return self.regex.match(path.rsplit('/', 1)[-1]) is not None
+
+
+def join_path(directory, name):
+    return directory + '/' + name if directory else name
+
+
+def find_repository_root(directory):
+    directory = os.path.abspath(directory)
+    while True:
+        if os.path.exists(os.path.join(directory, '.git')):
+            return directory
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
+
+# Paths and rule bases are relative to the repository root. Rules come from
+# .git/info/exclude and from the .gitignore files of every directory on the way
+# down. The global core.excludesFile is not read, and .git/info/exclude is only
+# found when .git is a directory, so not for worktrees and submodules.
+class GitIgnore:
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+
+    @classmethod
+    def for_directory(cls, directory):
+        root = find_repository_root(directory)
+        if root is None:
+            return '', cls()
+
+        prefix = os.path.relpath(os.path.abspath(directory), root).replace(os.sep, '/')
+        if prefix == '.':
+            prefix = ''
+
+        gitignore = cls().extended_from_file(os.path.join(root, '.git', 'info', 'exclude'), '')
+
+        base = ''
+        for name in prefix.split('/') if prefix else ():
+            gitignore = gitignore.extended(os.path.join(root, base), base)
+            base = join_path(base, name)
+
+        return prefix, gitignore
+
+    def extended(self, directory, base):
+        return self.extended_from_file(os.path.join(directory, '.gitignore'), base)
+
+    def extended_from_file(self, filename, base):
+        try:
+            with open(filename) as file:
+                lines = file.read().splitlines()
+        except OSError:
+            return self
+
+        rules = []
+        for line in lines:
+            line = strip_trailing_spaces(line)
+            if line and not line.startswith('#'):
+                rules.append(GitIgnoreRule(line, base))
+
+        if not rules:
+            return self
+        return GitIgnore(self.rules + rules)
+
+    def is_ignored(self, path, is_directory):
+        ignored = False
+        for rule in self.rules:
+            if rule.matches(path, is_directory):
+                ignored = not rule.negated
+        return ignored
+
+
+class FileFinder:
+    def __init__(self, include=DEFAULT_INCLUDE, exclude=DEFAULT_EXCLUDE, gitignore=True, git=False):
+        self.include = tuple(include)
+        self.exclude = VCS_DIRECTORIES + tuple(exclude)
+        self.gitignore = gitignore
+        self.git = git
+
+    def find(self, root_directory):
+        if self.git:
+            return self.find_with_git(root_directory)
+        return self.walk(root_directory)
+
+    def is_included(self, path):
+        name = path.rsplit('/', 1)[-1]
+        return any(fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(path, pattern)
+                   for pattern in self.include)
+
+    def is_excluded(self, path):
+        name = path.rsplit('/', 1)[-1]
+        return any(fnmatch.fnmatchcase(name, pattern) or fnmatch.fnmatchcase(path, pattern)
+                   for pattern in self.exclude)
+
+    def walk(self, root_directory):
+        # Directories are pruned before descending into them and files are
+        # yielded as soon as they are found, so parsing can start right away.
+        if self.gitignore:
+            prefix, gitignore = GitIgnore.for_directory(root_directory)
+        else:
+            prefix, gitignore = '', GitIgnore()
+
+        stack = [('', gitignore)]
+
+        while stack:
+            relative_directory, gitignore = stack.pop()
+            directory = os.path.join(root_directory, relative_directory)
+
+            if self.gitignore:
+                gitignore = gitignore.extended(directory, join_path(prefix, relative_directory))
+
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+
+            subdirectories = []
+            for entry in entries:
+                path = join_path(relative_directory, entry.name)
+                is_directory = entry.is_dir(follow_symlinks=False)
+
+                if self.is_excluded(path) or gitignore.is_ignored(join_path(prefix, path), is_directory):
+                    continue
+
+                if is_directory:
+                    subdirectories.append((path, gitignore))
+                elif self.is_included(path):
+                    yield entry.path
+
+            stack.extend(reversed(subdirectories))
+
+    def find_with_git(self, root_directory):
+        command = ['git', 'ls-files', '-z', '--cached', '--others', '--exclude-standard']
+        process = subprocess.Popen(command, cwd=root_directory, stdout=subprocess.PIPE)
+
+        completed = False
+        try:
+            buffer = b''
+            for chunk in iter(lambda: process.stdout.read(65536), b''):
+                buffer += chunk
+                *paths, buffer = buffer.split(b'\0')
+                for path in paths:
+                    path = os.fsdecode(path)
+                    full_path = os.path.join(root_directory, path)
+                    # Tracked files deleted from the working tree are still
+                    # listed by --cached.
+                    if self.is_git_path_included(path) and os.path.isfile(full_path):
+                        yield full_path
+            completed = True
+        finally:
+            process.stdout.close()
+            if not completed:
+                process.kill()
+            process.wait()
+
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+    def is_git_path_included(self, path):
+        parts = path.split('/')
+        for index in range(1, len(parts)):
+            if self.is_excluded('/'.join(parts[:index])):
+                return False
+        return not self.is_excluded(path) and self.is_included(path)
@@ -0,0 +1,154 @@
+from collections import defaultdict
+
+from tree import (Assignment, CompositeNode, CompoundAssignment, CStyleLoop, NullStatement, UnknownStatement,
+                  WhileStatement)
+
+# Node types that can be coerced into one another are treated as the same kind
+# when computing block signatures, so that e.g. a for loop and an equivalent
+# while loop still end up being compared.
+KIND_ALIASES = {
+    CStyleLoop: WhileStatement,
+    CompoundAssignment: Assignment,
+}
+
+# Only nodes in statement position, i.e. direct children of blocks, make up
+# the kind signature. Expressions nested in statements, such as identifiers and
+# literals, appear in almost every block and would make nearly all signatures
+# overlap. Expression statements like `x = y;` or `i++;` are still counted.
+IGNORED_STATEMENT_KINDS = (CompositeNode, NullStatement, UnknownStatement)
+
+
+class Match:
+    def __init__(self, checked_key, checked_block, compared_key, compared_block, similarity):
+        self.checked_key = checked_key
+        self.checked_block = checked_block
+        self.compared_key = compared_key
+        self.compared_block = compared_block
+        self.similarity = similarity
+
+    @property
+    def checked_name(self):
+        return self.checked_key[0]
+
+    @property
+    def compared_name(self):
+        return self.compared_key[0]
+
+    def __repr__(self):
+        return 'Match({}, {}, {})'.format(repr(self.checked_name), repr(self.compared_name), repr(self.similarity))
+
+
+class BlockSignature:
+    def __init__(self, block):
+        self.size = 0
+        kinds = set()
+
+        for node in block.walk():
+            self.size += 1
+            if not isinstance(node, CompositeNode):
+                continue
+
+            for child in node.children:
+                if not isinstance(child, IGNORED_STATEMENT_KINDS):
+                    kind = type(child)
+                    kinds.add(KIND_ALIASES.get(kind, kind))
+
+        self.kinds = frozenset(kinds)
+
+    @property
+    def bucket(self):
+        return self.size.bit_length()
+
+    def is_compatible(self, other):
+        if abs(self.bucket - other.bucket) > 1:
+            return False
+        if not self.kinds or not other.kinds:
+            return True
+        return not self.kinds.isdisjoint(other.kinds)
+
+
+class BlockIndex:
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.entries = []
+        self.buckets = defaultdict(list)
+
+        for key, block in corpus.blocks.items():
+            self.add(key, block)
+
+    def add(self, key, block):
+        entry = (len(self.entries), key, block, BlockSignature(block))
+        self.entries.append(entry)
+        self.buckets[entry[3].bucket].append(entry)
+
+    def candidates(self, signature):
+        for bucket in (signature.bucket - 1, signature.bucket, signature.bucket + 1):
+            for entry in self.buckets.get(bucket, ()):
+                if signature.is_compatible(entry[3]):
+                    yield entry
+
+    def check(self, blocks, blocking=False):
+        for checked_key, checked_block in blocks.items():
+            if blocking:
+                candidates = self.candidates(BlockSignature(checked_block))
+            else:
+                candidates = self.entries
+
+            for _, compared_key, compared_block, _ in candidates:
+                similarity = compared_block.compare(checked_block)
+                if similarity > 0:
+                    yield Match(checked_key, checked_block, compared_key, compared_block, similarity)
+
+    def self_check(self, threshold=0, blocking=True):
+        # Every unordered pair is scored exactly once. Since comparison is not
+        # symmetric, the pair is always compared from the side of the bigger
+        # block so that the extra statements of the bigger block are penalized
+        # rather than ignored.
+        for rank, key, block, signature in self.entries:
+            if blocking:
+                candidates = self.candidates(signature)
+            else:
+                candidates = self.entries
+
+            for other_rank, other_key, other_block, other_signature in candidates:
+                if other_rank <= rank:
+                    continue
+
+                if other_signature.size > signature.size:
+                    similarity = other_block.compare(block)
+                else:
+                    similarity = block.compare(other_block)
+
+                if similarity > threshold:
+                    yield Match(key, block, other_key, other_block, similarity)
+
+
+def check(known_corpus, blocks, blocking=False):
+    return BlockIndex(known_corpus).check(blocks, blocking)
+
+
+def self_check(corpus, threshold=0, blocking=True):
+    return BlockIndex(corpus).self_check(threshold, blocking)
+
+
+def clone_classes(matches):
+    parents = {}
+
+    def find(key):
+        parents.setdefault(key, key)
+        while parents[key] != key:
+            parents[key] = parents[parents[key]]
+            key = parents[key]
+        return key
+
+    for match in matches:
+        left = find(match.checked_key)
+        right = find(match.compared_key)
+        if left != right:
+            parents[right] = left
+
+    classes = defaultdict(list)
+    for key in parents:
+        classes[find(key)].append(key)
+
+    return sorted(sorted(members) for members in classes.values() if len(members) > 1)
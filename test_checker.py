@@ -0,0 +1,165 @@
+import asyncio
+import sys
+import threading
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import checker
+import matcher
+from tree import ASTBuilder, Corpus
+
+
+def add_function(corpus, filename, operation):
+    location = corpus.locations.pack(filename, 3, 1, 5, 2)
+    builder = ASTBuilder(corpus.strings)
+    builder.open_root(location)
+    builder.open_return(location)
+    builder.open_binary_operation(operation, location)
+    builder.add_identifier('a', location)
+    builder.add_identifier('b', location)
+    corpus.add_block('f()', builder.product)
+
+
+class StubParser:
+    # Parses "sources" made of a single binary operator. Sources starting
+    # with "bad" fail, and parsing waits for `gate` to be set.
+    instances = []
+    parsed = []
+    gate = None
+
+    def __init__(self):
+        self.corpus = Corpus()
+        StubParser.instances.append(self)
+
+    @property
+    def blocks(self):
+        return self.corpus.blocks
+
+    def parse_source(self, filename, content):
+        if StubParser.gate is not None:
+            StubParser.gate.wait(5)
+        StubParser.parsed.append(content)
+        if content.startswith('bad'):
+            raise ValueError(content)
+        add_function(self.corpus, filename, content)
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'cpp_parser', types.SimpleNamespace(Parser=StubParser))
+    monkeypatch.setattr(StubParser, 'instances', [])
+    monkeypatch.setattr(StubParser, 'parsed', [])
+    monkeypatch.setattr(StubParser, 'gate', None)
+
+    known = Corpus()
+    add_function(known, 'known.cc', '+')
+    return matcher.BlockIndex(known)
+
+
+@pytest.fixture
+def executor(index):
+    executor = ThreadPoolExecutor(2, initializer=checker.init_worker, initargs=(index,))
+    yield executor
+    executor.shutdown()
+
+
+def make_checker(index, executor):
+    return checker.Checker(index, executor=executor, workers=2)
+
+
+def summarize(result):
+    return [(str(result.checked_location(match)), str(result.compared_location(match)), match.similarity)
+            for match in result.matches]
+
+
+def test_check_reports_matches_per_source(index, executor):
+    async def run():
+        return await make_checker(index, executor).check({'a.cc': '+', 'b.cc': '-'})
+
+    results = asyncio.run(run())
+
+    assert summarize(results['a.cc']) == [('a.cc <3:1-5:2>', 'known.cc <3:1-5:2>', 1.0)]
+    assert summarize(results['b.cc']) == []
+    assert results['a.cc'].error is None
+
+
+def test_concurrent_requests_are_batched_and_deduplicated(index, executor):
+    async def run():
+        checker_ = make_checker(index, executor)
+        results = await asyncio.gather(checker_.check({'a.cc': '+', 'b.cc': '-', 'c.cc': '*'}),
+                                       checker_.check({'d.cc': '+'}))
+        return checker_, results
+
+    checker_, (first, second) = asyncio.run(run())
+
+    assert sorted(StubParser.parsed) == ['*', '+', '-']
+    assert len(StubParser.instances) == 2
+    assert summarize(second['d.cc']) == [('d.cc <3:1-5:2>', 'known.cc <3:1-5:2>', 1.0)]
+    assert summarize(first['a.cc']) == [('a.cc <3:1-5:2>', 'known.cc <3:1-5:2>', 1.0)]
+    assert checker_.in_flight == {}
+
+
+def test_parse_errors_are_reported_per_source(index, executor):
+    async def run():
+        return await make_checker(index, executor).check({'a.cc': '+', 'c.cc': 'bad'})
+
+    results = asyncio.run(run())
+
+    assert isinstance(results['c.cc'].error, ValueError)
+    assert results['c.cc'].matches is None
+    assert results['a.cc'].error is None
+    assert len(results['a.cc'].matches) == 1
+
+
+def test_stream_yields_results_as_they_complete(index, executor):
+    async def run():
+        return [result.filename async for result in make_checker(index, executor).stream({'a.cc': '+', 'b.cc': '-'})]
+
+    assert sorted(asyncio.run(run())) == ['a.cc', 'b.cc']
+
+
+@pytest.mark.parametrize('delay', [0, 0.05])
+def test_cancelled_chunks_cancel_waiting_callers(index, executor, delay):
+    # Without a delay the chunk task is cancelled before it starts, otherwise
+    # while it waits for the executor.
+    StubParser.gate = threading.Event()
+
+    async def run():
+        checker_ = make_checker(index, executor)
+        request = asyncio.ensure_future(checker_.check({'a.cc': '+'}))
+
+        while not checker_.chunk_tasks:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(delay)
+        for task in list(checker_.chunk_tasks):
+            task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        return checker_
+
+    try:
+        checker_ = asyncio.run(run())
+    finally:
+        StubParser.gate.set()
+
+    assert checker_.in_flight == {}
+
+
+def test_cancelled_batch_cancels_queued_requests(index, executor):
+    async def run():
+        checker_ = checker.Checker(index, executor=executor, workers=2, batch_window=10)
+        request = asyncio.ensure_future(checker_.check({'a.cc': '+'}))
+        await asyncio.sleep(0)
+        checker_.batch_task.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await request
+        return checker_
+
+    checker_ = asyncio.run(run())
+
+    assert checker_.in_flight == {}
+    assert checker_.queue == []
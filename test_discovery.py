@@ -0,0 +1,176 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import app
+from discovery import FileFinder, GitIgnore, GitIgnoreRule, translate_gitignore_pattern
+
+
+def matches(pattern, path):
+    return translate_gitignore_pattern(pattern).match(path) is not None
+
+
+def test_wildcards_do_not_cross_directories():
+    assert matches('*.cc', 'a.cc')
+    assert not matches('*.cc', 'src/a.cc')
+    assert matches('gen_?.cc', 'gen_a.cc')
+    assert not matches('gen_?.cc', 'gen_/.cc')
+
+
+def test_double_star():
+    assert matches('**/gen', 'gen')
+    assert matches('**/gen', 'src/deep/gen')
+    assert matches('build/**', 'build/a/b.cc')
+    assert matches('a/**/b', 'a/b')
+    assert matches('a/**/b', 'a/x/y/b')
+
+
+def test_bracket_expression():
+    assert matches('gen_[ab].cc', 'gen_a.cc')
+    assert not matches('gen_[ab].cc', 'gen_c.cc')
+    assert matches('gen_[a-c].cc', 'gen_b.cc')
+
+
+def test_negated_bracket_expression():
+    assert matches('gen_[!a].cc', 'gen_b.cc')
+    assert not matches('gen_[!a].cc', 'gen_a.cc')
+    assert matches('gen_[!a].cc', 'gen_!.cc')
+    assert matches('gen_[^a].cc', 'gen_b.cc')
+    assert not matches('gen_[!a].cc', 'gen_/.cc')
+
+
+def test_unterminated_bracket_is_literal():
+    assert matches('gen_[a', 'gen_[a')
+
+
+def test_escaped_characters():
+    assert matches('\\#keep.cc', '#keep.cc')
+    assert matches('\\!keep.cc', '!keep.cc')
+    assert matches('\\*.cc', '*.cc')
+    assert not matches('\\*.cc', 'a.cc')
+
+
+def test_escaped_leading_characters_in_rules(tmp_path):
+    (tmp_path / '.gitignore').write_text('\\#keep.cc\n\\!keep.cc\n# comment.cc\n')
+    gitignore = GitIgnore().extended(str(tmp_path), '')
+
+    assert gitignore.is_ignored('#keep.cc', False)
+    assert gitignore.is_ignored('!keep.cc', False)
+    assert not gitignore.is_ignored('# comment.cc', False)
+    assert not gitignore.is_ignored('keep.cc', False)
+
+
+def test_escaped_trailing_space(tmp_path):
+    (tmp_path / '.gitignore').write_text('name\\ \nother  \n')
+    gitignore = GitIgnore().extended(str(tmp_path), '')
+
+    assert gitignore.is_ignored('name ', False)
+    assert not gitignore.is_ignored('name', False)
+    assert gitignore.is_ignored('other', False)
+
+
+def test_negation_and_directory_rules():
+    gitignore = GitIgnore([
+        GitIgnoreRule('*.tmp.cc', ''),
+        GitIgnoreRule('!keep.tmp.cc', ''),
+        GitIgnoreRule('gen/', ''),
+    ])
+
+    assert gitignore.is_ignored('src/a.tmp.cc', False)
+    assert not gitignore.is_ignored('src/keep.tmp.cc', False)
+    assert gitignore.is_ignored('src/gen', True)
+    assert not gitignore.is_ignored('src/gen', False)
+
+
+def test_rules_are_relative_to_their_base():
+    rule = GitIgnoreRule('/c.h', 'src/sub')
+
+    assert rule.matches('src/sub/c.h', False)
+    assert not rule.matches('src/sub/deep/c.h', False)
+    assert not rule.matches('c.h', False)
+
+
+def test_walk_applies_rules_from_parent_directories(tmp_path):
+    (tmp_path / '.git' / 'info').mkdir(parents=True)
+    (tmp_path / '.git' / 'info' / 'exclude').write_text('local.cc\n')
+    (tmp_path / '.gitignore').write_text('gen/\n/src/out/\n')
+    for path in ('src/a.cc', 'src/local.cc', 'src/gen/g.cc', 'src/out/o.cc', 'src/sub/out/o.cc'):
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text('')
+
+    found = FileFinder().find(str(tmp_path / 'src'))
+
+    assert sorted(os.path.relpath(path, str(tmp_path)) for path in found) == [
+        os.path.join('src', 'a.cc'),
+        os.path.join('src', 'sub', 'out', 'o.cc'),
+    ]
+
+
+def make_tree(root, paths):
+    for path in paths:
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text('')
+
+
+def relative_paths(root, found):
+    return sorted(os.path.relpath(path, str(root)).replace(os.sep, '/') for path in found)
+
+
+def test_walk_finds_all_default_extensions(tmp_path):
+    make_tree(tmp_path, ['a.cc', 'b.cpp', 'c.cxx', 'd.h', 'e.hpp', 'f.hxx', 'g.py', 'hpp'])
+
+    found = FileFinder(gitignore=False).find(str(tmp_path))
+
+    assert relative_paths(tmp_path, found) == ['a.cc', 'b.cpp', 'c.cxx', 'd.h', 'e.hpp', 'f.hxx']
+
+
+def test_walk_prunes_default_excludes(tmp_path):
+    make_tree(tmp_path, ['src/a.cc', 'build/b.cc', 'cmake-build-debug/c.cc', 'third_party/d.cc',
+                         'src/vendor/e.cc', '.git/f.cc', '.hg/g.cc'])
+
+    found = FileFinder(gitignore=False).find(str(tmp_path))
+
+    assert relative_paths(tmp_path, found) == ['src/a.cc']
+
+
+def test_custom_excludes_replace_defaults_but_keep_vcs_pruned(tmp_path, monkeypatch):
+    make_tree(tmp_path, ['src/a.cc', 'build/b.cc', 'generated/c.cc', '.git/objects/d.cc'])
+    visited = []
+    scandir = os.scandir
+
+    def recording_scandir(path):
+        visited.append(os.path.relpath(path, str(tmp_path)))
+        return scandir(path)
+
+    monkeypatch.setattr(os, 'scandir', recording_scandir)
+    found = FileFinder(exclude=['generated'], gitignore=False).find(str(tmp_path))
+
+    assert relative_paths(tmp_path, found) == ['build/b.cc', 'src/a.cc']
+    assert not any(path.startswith('.git') for path in visited)
+
+
+@pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed')
+def test_git_mode_lists_tracked_and_untracked_sources(tmp_path):
+    make_tree(tmp_path, ['src/a.cc', 'src/deleted.cc', 'src/untracked.hpp', 'src/ignored.cc', 'build/b.cc',
+                         'notes.txt'])
+    (tmp_path / '.gitignore').write_text('ignored.cc\n')
+    subprocess.run(['git', 'init', '-q'], cwd=str(tmp_path), check=True)
+    subprocess.run(['git', 'add', 'src/a.cc', 'src/deleted.cc', 'build/b.cc', 'notes.txt'],
+                   cwd=str(tmp_path), check=True)
+    (tmp_path / 'src' / 'deleted.cc').unlink()
+
+    found = FileFinder(git=True).find(str(tmp_path))
+
+    assert relative_paths(tmp_path, found) == ['src/a.cc', 'src/untracked.hpp']
+
+
+def test_cli_finder_always_skips_vcs_directories():
+    args = app.make_argument_parser().parse_args(['self-check', 'src', '--exclude', 'generated', '--git'])
+    finder = app.make_finder(args)
+
+    assert finder.git
+    assert finder.is_excluded('.git')
+    assert finder.is_excluded('generated')
+    assert not finder.is_excluded('build')
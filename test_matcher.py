@@ -0,0 +1,154 @@
+import itertools
+
+import matcher
+from tree import ASTBuilder, CompositeNode, Corpus
+
+
+def make_block(*statements, location=0):
+    builder = ASTBuilder()
+    builder.open_root(location)
+    for statement in statements:
+        statement(builder)
+    return builder.product
+
+
+def assign(left, right):
+    def build(builder):
+        builder.open_binary_operation('=', 0)
+        builder.add_identifier(left, 0)
+        builder.add_identifier(right, 0)
+        builder.close_node()
+    return build
+
+
+def increment(name):
+    def build(builder):
+        builder.open_unary_operation('++', 0)
+        builder.add_identifier(name, 0)
+        builder.close_node()
+    return build
+
+
+def return_sum(left, right):
+    def build(builder):
+        builder.open_return(0)
+        builder.open_binary_operation('+', 0)
+        builder.add_identifier(left, 0)
+        builder.add_identifier(right, 0)
+        builder.close_node()
+        builder.close_node()
+    return build
+
+
+def loop(*statements):
+    def build(builder):
+        builder.open_while_statement(0)
+        builder.add_identifier('running', 0)
+        builder.open_block(0)
+        for statement in statements:
+            statement(builder)
+        builder.close_node()
+        builder.close_node()
+    return build
+
+
+def make_corpus(blocks):
+    corpus = Corpus()
+    for name, block in blocks.items():
+        corpus.add_block(name, block)
+    return corpus
+
+
+def sample_corpus():
+    return make_corpus({
+        'assign': make_block(assign('x', 'y'), assign('y', 'z'), assign('z', 'x')),
+        'assign_and_return': make_block(assign('x', 'y'), assign('y', 'z'), assign('z', 'x'), return_sum('x', 'y')),
+        'increment': make_block(increment('i'), increment('j'), increment('k')),
+        'increment_copy': make_block(increment('i'), increment('j'), increment('k'), increment('l')),
+        'add': make_block(return_sum('a', 'b')),
+        'add_copy': make_block(return_sum('c', 'd')),
+        'loop': make_block(loop(increment('i'), assign('x', 'i'))),
+    })
+
+
+def pair(match):
+    return frozenset((match.checked_name, match.compared_name))
+
+
+def key_pair(match):
+    return frozenset((match.checked_key, match.compared_key))
+
+
+def test_expression_statements_are_part_of_signature():
+    signature = matcher.BlockSignature(make_block(assign('x', 'y'), increment('i'), loop(return_sum('a', 'b'))))
+
+    kinds = {kind.__name__ for kind in signature.kinds}
+    assert kinds == {'BinaryOperation', 'UnaryOperation', 'WhileStatement', 'ReturnStatement'}
+
+
+def test_blocking_keeps_expression_statement_clones():
+    matches = matcher.self_check(sample_corpus(), 0.5)
+
+    pairs = {pair(match) for match in matches}
+    assert frozenset(('assign', 'assign_and_return')) in pairs
+    assert frozenset(('increment', 'increment_copy')) in pairs
+
+
+def test_each_unordered_pair_is_scored_once(monkeypatch):
+    corpus = sample_corpus()
+    roots = {id(block) for block in corpus.blocks.values()}
+    compared = []
+    compare = CompositeNode.compare
+
+    def counting_compare(self, other):
+        if id(self) in roots and id(other) in roots:
+            compared.append((id(self), id(other)))
+        return compare(self, other)
+
+    monkeypatch.setattr(CompositeNode, 'compare', counting_compare)
+    list(matcher.self_check(corpus, blocking=False))
+
+    unordered = [frozenset(ids) for ids in compared]
+    assert all(len(ids) == 2 for ids in unordered)
+    assert len(unordered) == len(set(unordered))
+    assert len(unordered) == len(list(itertools.combinations(roots, 2)))
+
+
+def test_block_is_never_compared_with_itself():
+    corpus = make_corpus({'add': make_block(return_sum('a', 'b'))})
+
+    assert list(matcher.self_check(corpus, blocking=False)) == []
+
+
+def test_blocking_matches_exhaustive_check_on_compatible_pairs():
+    index = matcher.BlockIndex(sample_corpus())
+    signatures = {key: signature for _, key, _, signature in index.entries}
+
+    blocked = {key_pair(match): match.similarity for match in index.self_check(blocking=True)}
+    exhaustive = {key_pair(match): match.similarity for match in index.self_check(blocking=False)
+                  if signatures[match.checked_key].is_compatible(signatures[match.compared_key])}
+
+    assert blocked == exhaustive
+
+
+def test_clone_classes_group_transitively():
+    matches = [
+        matcher.Match('a', None, 'b', None, 1),
+        matcher.Match('c', None, 'b', None, 1),
+        matcher.Match('d', None, 'e', None, 1),
+        matcher.Match('c', None, 'a', None, 1),
+    ]
+
+    assert matcher.clone_classes(matches) == [['a', 'b', 'c'], ['d', 'e']]
+
+
+def test_blocks_with_the_same_name_are_kept_apart():
+    corpus = Corpus()
+    corpus.add_block('size()', make_block(return_sum('a', 'b'), location=1))
+    corpus.add_block('size()', make_block(return_sum('c', 'd'), location=2))
+    corpus.add_block('length()', make_block(return_sum('e', 'f'), location=3))
+
+    matches = list(matcher.self_check(corpus, 0.5))
+
+    assert len(corpus.blocks) == 3
+    assert matcher.clone_classes(matches) == [[('length()', 3), ('size()', 1), ('size()', 2)]]
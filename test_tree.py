@@ -0,0 +1,37 @@
+import sys
+
+import pytest
+
+from tree import LocationTable
+
+
+def test_location_round_trip():
+    locations = LocationTable()
+    first = locations.pack('a.cc', 1, 1, 3, 2)
+    second = locations.pack('b.cc', 100000, 1000, 104000, 1023)
+    third = locations.pack('a.cc', 7, 5, 7, 9)
+
+    assert str(locations.unpack(first)) == 'a.cc <1:1-3:2>'
+    assert str(locations.unpack(second)) == 'b.cc <100000:1000-104000:1023>'
+    assert str(locations.unpack(third)) == 'a.cc <7:5-7:9>'
+    assert locations.filenames == ['a.cc', 'b.cc']
+
+
+def test_packed_location_fits_into_64_bits():
+    locations = LocationTable()
+    packed = locations.pack('a.cc', (1 << 17) - 1, 1023, (1 << 17) - 1 + 4095, 1023)
+
+    assert packed < 1 << 64
+    assert sys.getsizeof(packed) <= sys.getsizeof((1 << 64) - 1)
+
+
+@pytest.mark.parametrize('coordinates', [
+    (1 << 17, 1, 1 << 17, 1),
+    (1, 1024, 1, 1),
+    (1, 1, 1, 1024),
+    (1, 1, 4097, 1),
+    (5, 1, 4, 1),
+])
+def test_pack_rejects_overflowing_fields(coordinates):
+    with pytest.raises(ValueError):
+        LocationTable().pack('a.cc', *coordinates)
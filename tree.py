@@ -23,6 +23,73 @@ class Location:
         return '{} <{}-{}>'.format(self.filename, self.start, self.end)
 
 
+class LocationTable:
+    # Locations are packed into a single 64-bit integer. The end line is stored
+    # as the number of lines spanned, since it is always close to the start.
+    FIELDS = (
+        ('file id', 15),
+        ('start line', 17),
+        ('start column', 10),
+        ('line span', 12),
+        ('end column', 10),
+    )
+
+    def __init__(self):
+        self.filenames = []
+        self.file_ids = {}
+
+    def pack(self, filename, start_line, start_column, end_line, end_column):
+        try:
+            file_id = self.file_ids[filename]
+        except KeyError:
+            file_id = len(self.filenames)
+            self.filenames.append(filename)
+            self.file_ids[filename] = file_id
+
+        packed = 0
+        values = (file_id, start_line, start_column, end_line - start_line, end_column)
+        for (name, bits), value in zip(self.FIELDS, values):
+            if not 0 <= value < 1 << bits:
+                raise ValueError('{} {} of {} does not fit into {} bits'.format(name, value, filename, bits))
+            packed = (packed << bits) | value
+        return packed
+
+    def unpack(self, packed):
+        file_id, start, end = self.split(packed)
+        return Location(self.filenames[file_id], start, end)
+
+    @classmethod
+    def split(cls, packed):
+        values = []
+        for _, bits in reversed(cls.FIELDS):
+            values.append(packed & ((1 << bits) - 1))
+            packed >>= bits
+        end_column, line_span, start_column, start_line, file_id = values
+
+        return file_id, Coordinate(start_line, start_column), Coordinate(start_line + line_span, end_column)
+
+
+class StringTable:
+    def __init__(self):
+        self.strings = {}
+
+    def intern(self, string):
+        return self.strings.setdefault(string, string)
+
+
+class Corpus:
+    def __init__(self):
+        self.blocks = {}
+        self.strings = StringTable()
+        self.locations = LocationTable()
+
+    def add_block(self, name, block):
+        # Function names alone are not unique across a codebase (think of
+        # methods of different classes), so blocks are keyed by name and
+        # location.
+        self.blocks[(name, block.location)] = block
+
+
 class CoercionError(Exception):
     pass
 
@@ -45,6 +112,11 @@ class ASTNode:
     def has_children(self):
         return len(self.children) > 0
 
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
     def compare(self, other):
         if isinstance(other, type(self)):
             return self.compare_same_type_weighted(other)
@@ -334,8 +406,9 @@ class WhileStatement(ASTNode):
 
 
 class ASTBuilder:
-    def __init__(self):
+    def __init__(self, strings=None):
         self.nodes_stack = []
+        self.strings = strings or StringTable()
 
     @property
     def product(self):
@@ -349,10 +422,10 @@ class ASTBuilder:
         self.nodes_stack.append(CompositeNode(location))
 
     def add_identifier(self, name, location):
-        self.add_leaf(Identifier(name, location))
+        self.add_leaf(Identifier(self.strings.intern(name), location))
 
     def add_literal(self, value, location):
-        self.add_leaf(Literal(value, location))
+        self.add_leaf(Literal(self.strings.intern(value), location))
 
     def add_unknown(self, location):
         self.add_leaf(UnknownStatement(location))
@@ -379,13 +452,13 @@ class ASTBuilder:
         self.add_nonleaf(CStyleLoop(location))
 
     def open_unary_operation(self, operation, location):
-        self.add_nonleaf(UnaryOperation(operation, location))
+        self.add_nonleaf(UnaryOperation(self.strings.intern(operation), location))
 
     def open_binary_operation(self, operation, location):
-        self.add_nonleaf(BinaryOperation(operation, location))
+        self.add_nonleaf(BinaryOperation(self.strings.intern(operation), location))
 
     def open_compound_assignment(self, operation, location):
-        self.add_nonleaf(CompoundAssignment(operation, location))
+        self.add_nonleaf(CompoundAssignment(self.strings.intern(operation), location))
 
     def open_if_statement(self, location):
         self.add_nonleaf(IfStatement(location))